@@ -1,23 +1,115 @@
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from typing import Generator
 from pathlib import Path
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 BACKEND_DIR = Path(__file__).resolve().parents[2]
-DATABASE_PATH = BACKEND_DIR / "database.sqlite3"
+DATABASE_PATH = Path(
+    os.environ.get("FITNESS_LOG_DATABASE_PATH") or BACKEND_DIR / "database.sqlite3"
+)
 DATABASE_URL = f"sqlite:///{DATABASE_PATH.as_posix()}"
 
+# Read side for analytics queries: an explicit replica URL, a periodically
+# refreshed snapshot of the database, or a read-only connection to the database.
+READ_DATABASE_URL = os.environ.get("FITNESS_LOG_READ_DATABASE_URL")
+READ_SNAPSHOT_SECONDS = float(os.environ.get("FITNESS_LOG_READ_SNAPSHOT_SECONDS", "0"))
+READ_SNAPSHOT_PATH = DATABASE_PATH.with_suffix(".snapshot.sqlite3")
+
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},
 )
 
+
+@event.listens_for(engine, "connect")
+def _enable_wal(dbapi_connection, connection_record):
+    # WAL lets readers and the writer proceed concurrently
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def _read_only_url(path: Path) -> str:
+    return f"sqlite:///file:{path.as_posix()}?mode=ro&uri=true"
+
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL)
+else:
+    read_engine = create_engine(
+        _read_only_url(READ_SNAPSHOT_PATH if READ_SNAPSHOT_SECONDS > 0 else DATABASE_PATH),
+        connect_args={"check_same_thread": False},
+    )
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
 )
 
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
+)
+
+_snapshot_lock = threading.Lock()
+_refresher_lock = threading.Lock()
+_snapshot_ready = threading.Event()
+_snapshot_refresher: threading.Thread | None = None
+
+
+def refresh_read_snapshot() -> None:
+    """Copy the database to the read snapshot."""
+    with _snapshot_lock:
+        source = sqlite3.connect(DATABASE_PATH)
+        target = sqlite3.connect(READ_SNAPSHOT_PATH)
+        try:
+            source.backup(target)
+            # Keep the snapshot a single self-contained file rather than a WAL database
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+    _snapshot_ready.set()
+
+
+def _refresh_read_snapshot_forever() -> None:
+    while True:
+        try:
+            refresh_read_snapshot()
+        except sqlite3.Error:
+            logger.exception("Refreshing the read snapshot failed")
+        # Never leave the first read waiting on a copy that failed
+        _snapshot_ready.set()
+        time.sleep(READ_SNAPSHOT_SECONDS)
+
+
+def start_snapshot_refresher() -> None:
+    """Start refreshing the read snapshot in the background, once."""
+    global _snapshot_refresher
+    if _snapshot_refresher is not None:
+        return
+    with _refresher_lock:
+        if _snapshot_refresher is not None:
+            return
+        if READ_SNAPSHOT_PATH.exists():
+            # A snapshot from a previous run is good enough until the first refresh
+            _snapshot_ready.set()
+        _snapshot_refresher = threading.Thread(
+            target=_refresh_read_snapshot_forever,
+            name="read-snapshot-refresher",
+            daemon=True,
+        )
+        _snapshot_refresher.start()
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -25,3 +117,16 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """Session for read-only queries that do not need to see the latest writes."""
+    if not READ_DATABASE_URL and READ_SNAPSHOT_SECONDS > 0:
+        start_snapshot_refresher()
+        # Only the very first read of a fresh install waits for a copy
+        _snapshot_ready.wait()
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+class IdempotencyKeyReused(ValueError):
+    """Raised when an idempotency key is sent again with a different request."""
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    response: Any = None
+    expires_at: float | None = None
+
+
+class IdempotencyStore:
+    """
+    Bounded in-memory store of responses keyed by client-supplied idempotency keys.
+
+    The first request for a key runs the handler and stores its response; retries
+    within the TTL get the stored response back. Concurrent requests with the same
+    key wait for the first one instead of running the handler twice.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fingerprint: str, handler: Callable[[], Any]) -> tuple[Any, bool]:
+        """Return (response, replayed) for the key, running handler only once."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry.expires_at is not None and entry.expires_at <= now):
+                entry = _Entry(fingerprint=fingerprint)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if entry.fingerprint != fingerprint:
+            raise IdempotencyKeyReused(f"Idempotency key {key!r} was used for a different request")
+
+        with entry.lock:
+            if entry.expires_at is not None:
+                return entry.response, True
+            response = handler()
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+            return response, False
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+
+# Events a subscriber may fall behind by before it is dropped
+MAX_PENDING_EVENTS = 256
+
+# Queued in place of the backlog when a subscriber is dropped for falling behind
+OVERFLOW = {"type": "overflow"}
+
+
+@dataclass(eq=False)
+class Subscription:
+    day_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(
+        default_factory=lambda: asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+    )
+    dropped: bool = False
+
+
+class DayChannels:
+    """
+    In-process pub/sub of set-level changes, one channel per fitness day.
+
+    Services publish from worker threads after committing; each WebSocket
+    subscriber receives the events on its own bounded event loop queue. A
+    subscriber that falls MAX_PENDING_EVENTS behind is unsubscribed and its
+    backlog replaced by OVERFLOW, so one stalled client cannot grow memory.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[int, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, day_id: int) -> Subscription:
+        subscription = Subscription(day_id=day_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[day_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.day_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.day_id]
+
+    def publish(self, day_id: int, event: dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(day_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, event)
+            except RuntimeError:
+                # The subscriber's event loop is already closed
+                self.unsubscribe(subscription)
+
+    def _deliver(self, subscription: Subscription, event: dict[str, Any]) -> None:
+        """Queue an event on the subscriber's loop, dropping the subscriber when it is full."""
+        if subscription.dropped:
+            return
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscription.dropped = True
+            self.unsubscribe(subscription)
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(OVERFLOW)
+
+
+day_channels = DayChannels()
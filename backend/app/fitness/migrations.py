@@ -0,0 +1,146 @@
+"""
+In-place schema upgrade for existing fitness log databases.
+
+Every step checks the current schema first, so the upgrade is safe to run on
+every start. Run it by hand from the backend directory with:
+
+    uv run python -m app.fitness.migrations
+"""
+
+import logging
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from app.core.models import BaseModel
+from app.fitness import models as fitness_models  # noqa: F401  (registers tables)
+from app.masterdata import models as masterdata_models  # noqa: F401
+from app.masterdata.models import MuscleGroup
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Bring the database schema up to date with the models."""
+    with engine.begin() as connection:
+        # Creates missing tables (and their indexes) only; existing tables are untouched
+        BaseModel.metadata.create_all(connection)
+        _move_primary_muscles_to_rows(connection)
+        _make_fitness_day_date_unique(connection)
+        _index_fitness_set_by_exercise_and_day(connection)
+
+
+def _column_names(connection: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def _move_primary_muscles_to_rows(connection: Connection) -> None:
+    """Split the old comma-joined fitness_day.primary_muscles into fitness_day_muscle rows."""
+    if "primary_muscles" not in _column_names(connection, "fitness_day"):
+        return
+
+    muscle_names = {muscle.value: muscle.name for muscle in MuscleGroup}
+    days = connection.execute(
+        text(
+            "SELECT id, primary_muscles FROM fitness_day "
+            "WHERE primary_muscles IS NOT NULL AND primary_muscles != ''"
+        )
+    ).all()
+    moved = 0
+    for day_id, primary_muscles in days:
+        position = 0
+        for value in (part.strip() for part in primary_muscles.split(",")):
+            if value not in muscle_names:
+                if value:
+                    logger.warning("Skipping unknown muscle %r on fitness day %s", value, day_id)
+                continue
+            result = connection.execute(
+                text(
+                    "INSERT OR IGNORE INTO fitness_day_muscle "
+                    "(fitness_day_id, muscle, position, created_at, created_by, updated_at, updated_by) "
+                    "VALUES (:day_id, :muscle, :position, CURRENT_TIMESTAMP, 1, CURRENT_TIMESTAMP, 1)"
+                ),
+                {"day_id": day_id, "muscle": muscle_names[value], "position": position},
+            )
+            if result.rowcount:
+                position += 1
+                moved += 1
+
+    connection.execute(text("ALTER TABLE fitness_day DROP COLUMN primary_muscles"))
+    logger.info("Moved %s primary muscle selections into fitness_day_muscle", moved)
+
+
+def _make_fitness_day_date_unique(connection: Connection) -> None:
+    """Merge fitness days that share a date into one row, then index the date as unique."""
+    indexes = inspect(connection).get_indexes("fitness_day")
+    if any(index["unique"] and index["column_names"] == ["date"] for index in indexes):
+        return
+
+    duplicates = connection.execute(
+        text(
+            "SELECT date, MIN(start_time), "
+            "CASE WHEN COUNT(end_time) = COUNT(*) THEN MAX(end_time) END "
+            "FROM fitness_day GROUP BY date HAVING COUNT(*) > 1"
+        )
+    ).all()
+    for day_date, start_time, end_time in duplicates:
+        day_ids = connection.execute(
+            text("SELECT id FROM fitness_day WHERE date = :date ORDER BY id"),
+            {"date": day_date},
+        ).scalars().all()
+        survivor, merged = day_ids[0], day_ids[1:]
+
+        for day_id in merged:
+            connection.execute(
+                text("UPDATE fitness_set SET fitness_day_id = :survivor WHERE fitness_day_id = :day_id"),
+                {"survivor": survivor, "day_id": day_id},
+            )
+            # Append the merged day's muscles after the survivor's, skipping repeats
+            connection.execute(
+                text(
+                    "INSERT OR IGNORE INTO fitness_day_muscle "
+                    "(fitness_day_id, muscle, position, created_at, created_by, updated_at, updated_by) "
+                    "SELECT :survivor, muscle, position + ("
+                    "  SELECT COALESCE(MAX(position) + 1, 0) FROM fitness_day_muscle "
+                    "  WHERE fitness_day_id = :survivor"
+                    "), created_at, created_by, CURRENT_TIMESTAMP, 1 "
+                    "FROM fitness_day_muscle WHERE fitness_day_id = :day_id ORDER BY position"
+                ),
+                {"survivor": survivor, "day_id": day_id},
+            )
+            connection.execute(
+                text("DELETE FROM fitness_day_muscle WHERE fitness_day_id = :day_id"),
+                {"day_id": day_id},
+            )
+            connection.execute(
+                text("DELETE FROM fitness_day WHERE id = :day_id"), {"day_id": day_id}
+            )
+
+        connection.execute(
+            text(
+                "UPDATE fitness_day SET start_time = :start_time, end_time = :end_time, "
+                "updated_at = CURRENT_TIMESTAMP, updated_by = 1 WHERE id = :survivor"
+            ),
+            {"start_time": start_time, "end_time": end_time, "survivor": survivor},
+        )
+        logger.info("Merged fitness days %s into %s for %s", merged, survivor, day_date)
+
+    connection.execute(text("DROP INDEX IF EXISTS ix_fitness_day_date"))
+    connection.execute(text("CREATE UNIQUE INDEX ix_fitness_day_date ON fitness_day (date)"))
+
+
+def _index_fitness_set_by_exercise_and_day(connection: Connection) -> None:
+    """Replace the single-column exercise_id index with the last-session covering index."""
+    connection.execute(text("DROP INDEX IF EXISTS ix_fitness_set_exercise_id"))
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_fitness_set_exercise_day "
+            "ON fitness_set (exercise_id, fitness_day_id)"
+        )
+    )
+
+
+if __name__ == "__main__":
+    from app.core.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    upgrade_schema(engine)
@@ -1,10 +1,22 @@
 from datetime import date, datetime
 from enum import Enum
 
-from sqlalchemy import Date, DateTime, Enum as SAEnum, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Enum as SAEnum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.models import BaseModel
+from app.masterdata.models import MuscleGroup
 
 
 class SetType(str, Enum):
@@ -17,19 +29,45 @@ class SetType(str, Enum):
 class FitnessDay(BaseModel):
     __tablename__ = "fitness_day"
 
-    date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    date: Mapped[date] = mapped_column(Date, nullable=False, unique=True, index=True)
     timezone: Mapped[str] = mapped_column(String(64), nullable=False, default="UTC")
-    primary_muscles: Mapped[str | None] = mapped_column(Text, nullable=True)
     start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     end_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     sets: Mapped[list["FitnessSet"]] = relationship(
         back_populates="fitness_day",
         cascade="all, delete-orphan",
     )
+    muscles: Mapped[list["FitnessDayMuscle"]] = relationship(
+        back_populates="fitness_day",
+        cascade="all, delete-orphan",
+        order_by="FitnessDayMuscle.position",
+    )
+
+
+class FitnessDayMuscle(BaseModel):
+    """Primary muscle group trained on a fitness day, one row per muscle."""
+
+    __tablename__ = "fitness_day_muscle"
+    __table_args__ = (
+        UniqueConstraint("fitness_day_id", "muscle", name="uq_fitness_day_muscle"),
+        Index("ix_fitness_day_muscle_muscle_day", "muscle", "fitness_day_id"),
+    )
+
+    fitness_day_id: Mapped[int] = mapped_column(
+        ForeignKey("fitness_day.id", ondelete="CASCADE"), nullable=False
+    )
+    fitness_day: Mapped["FitnessDay"] = relationship(back_populates="muscles")
+
+    muscle: Mapped[MuscleGroup] = mapped_column(SAEnum(MuscleGroup), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
 
 class FitnessSet(BaseModel):
     __tablename__ = "fitness_set"
+    __table_args__ = (
+        # Serves the per-exercise "last session" lookup without touching the table
+        Index("ix_fitness_set_exercise_day", "exercise_id", "fitness_day_id"),
+    )
 
     fitness_day_id: Mapped[int] = mapped_column(
         ForeignKey("fitness_day.id", ondelete="RESTRICT"), nullable=False, index=True
@@ -37,7 +75,7 @@ class FitnessSet(BaseModel):
     fitness_day: Mapped["FitnessDay"] = relationship(back_populates="sets")
 
     exercise_id: Mapped[int] = mapped_column(
-        ForeignKey("exercise.id", ondelete="RESTRICT"), nullable=False, index=True
+        ForeignKey("exercise.id", ondelete="RESTRICT"), nullable=False
     )
     exercise = relationship("Exercise")
 
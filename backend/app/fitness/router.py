@@ -1,13 +1,30 @@
+import asyncio
+import json
+import logging
 from calendar import monthrange
 from datetime import datetime, timezone
 from typing import Any
 
-from fastapi import APIRouter, Depends, Header, HTTPException
+import anyio
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db, get_read_db
+from app.core.idempotency import IdempotencyKeyReused, IdempotencyStore
 from app.fitness import service
-from app.fitness.models import SetType
+from app.fitness.live import OVERFLOW, day_channels
+from app.fitness.models import FitnessSet, SetType
 from app.fitness.schemas import (
     FitnessSetCreate,
     FitnessSetRead,
@@ -17,8 +34,12 @@ from app.masterdata import service as masterdata_service
 from app.masterdata.models import MuscleGroup
 from app.masterdata.schemas import ExerciseCreate
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+set_create_idempotency = IdempotencyStore()
+
 
 def require_timezone(x_timezone: str = Header(..., alias="X-Timezone")) -> str:
     if not x_timezone or not x_timezone.strip():
@@ -64,19 +85,44 @@ def get_fitness_day(
     year: int | None = None,
     month: int | None = None,
     date: str | None = None,
+    muscle: MuscleGroup | None = None,
+    from_date: str | None = None,
+    to_date: str | None = None,
     tz: str = Depends(require_timezone),
     db: Session = Depends(get_db),
 ):
     """
     Unified endpoint for fitness days.
-    - If year/month: returns monthly map for calendar.
+    - If year/month: returns monthly map for calendar, optionally filtered by muscle.
+    - If muscle only: returns the days that trained that muscle, newest first,
+      optionally bounded by from_date/to_date.
     - If date: returns detail for that date.
     - If no params: returns today's detail.
     """
+    if (from_date or to_date) and (muscle is None or year is not None or month is not None):
+        raise HTTPException(
+            status_code=400, detail="from_date/to_date only apply to a muscle-only query"
+        )
+    if muscle is not None and date:
+        raise HTTPException(status_code=400, detail="muscle cannot be combined with date")
+
     if year is not None and month is not None:
-        training_days = service.list_fitness_days_by_month(db=db, year=year, month=month)
+        training_days = service.list_fitness_days_by_month(
+            db=db, year=year, month=month, muscle=muscle
+        )
         return {"training_days": {day.date.day: day.id for day in training_days}}
 
+    if muscle is not None:
+        try:
+            from_date_dt = datetime.strptime(from_date, "%Y-%m-%d") if from_date else None
+            to_date_dt = datetime.strptime(to_date, "%Y-%m-%d") if to_date else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format, expect YYYY-MM-DD")
+        days = service.list_fitness_days_by_muscle(
+            db=db, muscle=muscle, from_date=from_date_dt, to_date=to_date_dt
+        )
+        return {"days": [{"id": day.id, "date": day.date.isoformat()} for day in days]}
+
     if date:
         try:
             target_date = datetime.strptime(date, "%Y-%m-%d").date()
@@ -123,27 +169,205 @@ def get_fitness_day_by_id(day_id: int, db: Session = Depends(get_db)):
     return service.serialize_fitness_day_detail(day)
 
 
+def get_live_set_id(db: Session, day_id: int, message: dict) -> int:
+    """The message's set_id, provided it names a set on the socket's day."""
+    set_id = message.get("set_id")
+    if not isinstance(set_id, int) or isinstance(set_id, bool):
+        raise ValueError("set_id must be an integer")
+    # Outside the SQLite rowid range the driver raises instead of finding nothing
+    if not 0 < set_id < 2**63:
+        raise LookupError("Set not found")
+    fitness_set = db.get(FitnessSet, set_id)
+    if fitness_set is None or fitness_set.fitness_day_id != day_id:
+        raise LookupError("Set not found")
+    return set_id
+
+
+def apply_live_mutation(day_id: int, message: dict, tz: str) -> dict:
+    """Run a mutation received over the live socket in its own session."""
+    action = message.get("action")
+    data = message.get("data", {})
+    if not isinstance(data, dict):
+        raise ValueError("data must be a JSON object")
+    with SessionLocal() as db:
+        try:
+            if action == "create_set":
+                created = service.create_fitness_set(
+                    db, FitnessSetCreate.model_validate({**data, "fitness_day_id": day_id}), tz
+                )
+                return {"set": FitnessSetRead.model_validate(created).model_dump(mode="json")}
+            if action == "update_set":
+                set_id = get_live_set_id(db, day_id, message)
+                updated = service.update_fitness_set(
+                    db,
+                    set_id,
+                    FitnessSetUpdate.model_validate(data),
+                    defer=bool(message.get("defer")),
+                )
+                if not updated:
+                    raise LookupError("Set not found")
+                return {"set": FitnessSetRead.model_validate(updated).model_dump(mode="json")}
+            if action == "delete_set":
+                if not service.delete_fitness_set(db, get_live_set_id(db, day_id, message)):
+                    raise LookupError("Set not found")
+                return {}
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+    raise ValueError(f"Unknown action: {action}")
+
+
+# Raised by the socket once the peer is gone or the close handshake has started
+SOCKET_CLOSED_ERRORS = (
+    RuntimeError,
+    OSError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+)
+
+
+class LiveSocket:
+    """WebSocket wrapper that reports every failure of a closed socket as WebSocketDisconnect."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+
+    async def send_json(self, data: Any) -> None:
+        try:
+            await self.websocket.send_json(data)
+        except SOCKET_CLOSED_ERRORS as exc:
+            raise WebSocketDisconnect(code=1006) from exc
+
+    async def receive_text(self) -> str:
+        try:
+            return await self.websocket.receive_text()
+        except SOCKET_CLOSED_ERRORS as exc:
+            raise WebSocketDisconnect(code=1006) from exc
+
+    async def close(self, code: int, reason: str) -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except SOCKET_CLOSED_ERRORS as exc:
+            raise WebSocketDisconnect(code=1006) from exc
+
+
+@router.websocket("/api/fitness/fitness_day/{day_id}/live")
+async def fitness_day_live(websocket: WebSocket, day_id: int, tz: str = "UTC"):
+    """
+    Live session channel for one fitness day.
+
+    Sends the day detail once, then set-level deltas after every committed change.
+    Accepts create_set / update_set / delete_set messages and answers each with
+    an ack (or error) carrying the client's request_id.
+    """
+    try:
+        service.resolve_timezone(tz)
+    except ValueError:
+        await websocket.close(code=1008, reason=f"Invalid timezone: {tz}")
+        return
+
+    def load_day() -> dict | None:
+        with SessionLocal() as db:
+            day = service.get_fitness_day_by_id(db, day_id)
+            return service.serialize_fitness_day_detail(day) if day else None
+
+    await websocket.accept()
+    socket = LiveSocket(websocket)
+    subscription = day_channels.subscribe(day_id)
+    try:
+        day = await run_in_threadpool(load_day)
+        if day is None:
+            await socket.close(code=1008, reason="Fitness day not found")
+            return
+        await socket.send_json({"type": "snapshot", "day": day})
+
+        async def push_deltas():
+            while True:
+                event = await subscription.queue.get()
+                if event is OVERFLOW:
+                    await socket.close(code=1013, reason="Client too slow")
+                    return
+                await socket.send_json(event)
+
+        async def receive_mutations():
+            while True:
+                reply: dict[str, Any] = {"request_id": None}
+                try:
+                    message = json.loads(await socket.receive_text())
+                    if not isinstance(message, dict):
+                        raise ValueError("Expected a JSON object")
+                    reply["request_id"] = message.get("request_id")
+                    result = await run_in_threadpool(apply_live_mutation, day_id, message, tz)
+                    reply.update(type="ack", **result)
+                except (LookupError, ValueError) as exc:
+                    reply.update(type="error", detail=str(exc))
+                except SQLAlchemyError:
+                    logger.exception("Live mutation on fitness day %s failed", day_id)
+                    reply.update(type="error", detail="Could not save the change")
+                await socket.send_json(reply)
+
+        tasks = [asyncio.create_task(push_deltas()), asyncio.create_task(receive_mutations())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.wait(tasks)
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        day_channels.unsubscribe(subscription)
+
+
 @router.post("/api/fitness/fitness_set/create", response_model=FitnessSetRead, tags=["Fitness Set"])
 def create_fitness_set(
     data: FitnessSetCreate,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     tz: str = Depends(require_timezone),
     db: Session = Depends(get_db),
 ):
-    return service.create_fitness_set(db, data, tz)
+    """Create a set. Retries carrying the same Idempotency-Key replay the first response."""
+    if not idempotency_key:
+        return service.create_fitness_set(db, data, tz)
+
+    def handler() -> FitnessSetRead:
+        return FitnessSetRead.model_validate(service.create_fitness_set(db, data, tz))
+
+    try:
+        created, replayed = set_create_idempotency.run(
+            idempotency_key, data.model_dump_json(), handler
+        )
+    except IdempotencyKeyReused as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return created
 
 
 @router.put("/api/fitness/fitness_set/{set_id}", response_model=FitnessSetRead, tags=["Fitness Set"])
 def update_fitness_set(
     set_id: int,
     data: FitnessSetUpdate,
+    defer: bool = False,
     db: Session = Depends(get_db),
 ):
-    updated = service.update_fitness_set(db, set_id, data)
+    """Update a set. Pass defer=true during a live session to coalesce rapid edits."""
+    updated = service.update_fitness_set(db, set_id, data, defer=defer)
     if not updated:
         raise HTTPException(status_code=404, detail="Set not found")
     return updated
 
 
+@router.post("/api/fitness/fitness_set/flush", tags=["Fitness Set"])
+def flush_fitness_sets(db: Session = Depends(get_db)):
+    """Write all deferred set edits now."""
+    return {"flushed": service.flush_pending_set_updates(db)}
+
+
 @router.delete("/api/fitness/fitness_set/{set_id}", tags=["Fitness Set"])
 def delete_fitness_set(
     set_id: int,
@@ -160,13 +384,59 @@ def get_fitness_logs(
     from_date: str | None = None,
     to_date: str | None = None,
     exercise_name: str | None = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> list[dict]:
     from_date_dt = datetime.strptime(from_date, "%Y-%m-%d") if from_date else None
     to_date_dt = datetime.strptime(to_date, "%Y-%m-%d") if to_date else None
     return service.list_fitness_logs(db, from_date_dt, to_date_dt, exercise_name)
 
 
+def resolve_before_date(before: str | None, tz: str):
+    if not before:
+        return service.local_today(tz)
+    try:
+        return datetime.strptime(before, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format, expect YYYY-MM-DD")
+
+
+@router.get("/api/fitness/exercise/last", tags=["Logs"])
+def get_last_exercise_sessions(
+    exercise_ids: list[int] = Query(...),
+    before: str | None = None,
+    tz: str = Depends(require_timezone),
+    db: Session = Depends(get_db),
+) -> list[dict]:
+    """Most recent session before the given date (default today) for each exercise."""
+    before_date = resolve_before_date(before, tz)
+    sessions = service.get_last_exercise_sessions(db, exercise_ids, before_date)
+    return list(sessions.values())
+
+
+@router.get("/api/fitness/exercise/{exercise_id}/last", tags=["Logs"])
+def get_last_exercise_session(
+    exercise_id: int,
+    before: str | None = None,
+    tz: str = Depends(require_timezone),
+    db: Session = Depends(get_db),
+) -> dict:
+    """Sets of the most recent session of an exercise before the given date (default today)."""
+    before_date = resolve_before_date(before, tz)
+    return service.get_last_exercise_sessions(db, [exercise_id], before_date)[exercise_id]
+
+
+@router.get("/api/fitness/muscle_frequency", tags=["Logs"])
+def get_muscle_frequency(
+    from_date: str | None = None,
+    to_date: str | None = None,
+    db: Session = Depends(get_read_db),
+) -> dict[str, int]:
+    """Number of training days per muscle group within the optional date range."""
+    from_date_dt = datetime.strptime(from_date, "%Y-%m-%d") if from_date else None
+    to_date_dt = datetime.strptime(to_date, "%Y-%m-%d") if to_date else None
+    return service.count_fitness_days_by_muscle(db, from_date_dt, to_date_dt)
+
+
 @router.get("/api/masterdata/exercises", tags=["Exercise"])
 def list_exercises(db: Session = Depends(get_db)):
     return masterdata_service.list_exercises(db)
@@ -1,12 +1,24 @@
+import threading
 from datetime import date, datetime, timezone
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from sqlalchemy import extract, func, select
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, delete, extract, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, contains_eager, selectinload
 
-from app.fitness.models import FitnessDay, FitnessSet
-from app.fitness.schemas import FitnessSetCreate, FitnessSetUpdate
-from app.masterdata.models import Exercise, Unit
+from app.core.cache import LRUCache
+from app.core.models import utc_now
+from app.fitness.live import day_channels
+from app.fitness.models import FitnessDay, FitnessDayMuscle, FitnessSet
+from app.fitness.schemas import FitnessSetCreate, FitnessSetRead, FitnessSetUpdate
+from app.fitness.write_buffer import set_write_buffer
+from app.masterdata.models import Exercise, MuscleGroup, Unit
+
+# (exercise_id, before date) -> most recent session of that exercise before the date
+last_session_cache = LRUCache(max_entries=512)
+# exercise_id -> number of invalidations, so a lookup that raced a write does not re-cache
+_last_session_generations: dict[int, int] = {}
+_last_session_lock = threading.Lock()
 
 
 def resolve_timezone(tz: str):
@@ -19,33 +31,68 @@ def resolve_timezone(tz: str):
         raise ValueError(f"Invalid timezone: {tz}") from exc
 
 
-def normalize_primary_muscle_selection(muscles) -> str | None:
+def normalize_primary_muscle_selection(muscles) -> list[MuscleGroup]:
     if not muscles:
-        return None
+        return []
     if isinstance(muscles, str):
         raw = [m.strip() for m in muscles.split(",") if m.strip()]
     else:
-        raw = []
-        for muscle in muscles:
-            value = str(muscle.value) if hasattr(muscle, "value") else str(muscle)
-            if value.strip():
-                raw.append(value)
-    if not raw:
-        return None
+        raw = list(muscles)
 
-    seen = set()
-    ordered = []
+    ordered: list[MuscleGroup] = []
     for muscle in raw:
-        if muscle not in seen:
-            seen.add(muscle)
-            ordered.append(muscle)
-    return ",".join(ordered)
+        muscle_group = muscle if isinstance(muscle, MuscleGroup) else MuscleGroup(muscle)
+        if muscle_group not in ordered:
+            ordered.append(muscle_group)
+    return ordered
+
+
+def set_fitness_day_muscles(db: Session, day: FitnessDay, muscles) -> None:
+    """
+    Sync the day's muscle rows with the selection, keeping unchanged rows in place.
+
+    Written as a delete plus an upsert rather than from the loaded rows, so
+    concurrent selections for the same day cannot collide on the unique
+    (fitness_day_id, muscle) constraint.
+    """
+    selection = normalize_primary_muscle_selection(muscles)
+    db.execute(
+        delete(FitnessDayMuscle)
+        .where(
+            FitnessDayMuscle.fitness_day_id == day.id,
+            FitnessDayMuscle.muscle.not_in(selection),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if selection:
+        upsert = sqlite_insert(FitnessDayMuscle).values(
+            [
+                {
+                    "fitness_day_id": day.id,
+                    "muscle": muscle,
+                    "position": position,
+                    "created_by": 1,
+                    "updated_by": 1,
+                }
+                for position, muscle in enumerate(selection)
+            ]
+        )
+        db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[FitnessDayMuscle.fitness_day_id, FitnessDayMuscle.muscle],
+                set_={
+                    "position": upsert.excluded.position,
+                    "updated_at": utc_now(),
+                    "updated_by": 1,
+                },
+                where=FitnessDayMuscle.position != upsert.excluded.position,
+            )
+        )
+    db.expire(day, ["muscles"])
 
 
-def parse_primary_muscles(value: str | None) -> list[str]:
-    if not value:
-        return []
-    return [item for item in (part.strip() for part in value.split(",")) if item]
+def serialize_primary_muscles(day: FitnessDay) -> list[str]:
+    return [day_muscle.muscle.value for day_muscle in day.muscles]
 
 
 def local_today(tz: str) -> date:
@@ -53,11 +100,19 @@ def local_today(tz: str) -> date:
     return datetime.now(tzinfo).date()
 
 
+def flush_pending_set_updates(db: Session | None = None) -> int:
+    if not set_write_buffer.has_pending():
+        return 0
+    return set_write_buffer.flush(db)
+
+
 def get_fitness_day_by_id(db: Session, day_id: int) -> FitnessDay | None:
+    flush_pending_set_updates(db)
     stmt = (
         select(FitnessDay)
         .where(FitnessDay.id == day_id)
         .options(
+            selectinload(FitnessDay.muscles),
             selectinload(FitnessDay.sets).selectinload(FitnessSet.exercise),
             selectinload(FitnessDay.sets).selectinload(FitnessSet.unit),
         )
@@ -65,6 +120,23 @@ def get_fitness_day_by_id(db: Session, day_id: int) -> FitnessDay | None:
     return db.execute(stmt).scalars().first()
 
 
+def serialize_fitness_set(fitness_set: FitnessSet) -> dict:
+    unit = fitness_set.unit
+    set_type_value = (
+        fitness_set.set_type.value
+        if hasattr(fitness_set.set_type, "value")
+        else fitness_set.set_type
+    )
+    return {
+        "id": fitness_set.id,
+        "set_type": set_type_value,
+        "weight": fitness_set.weight,
+        "reps": fitness_set.reps,
+        "unit": {"id": unit.id, "name": unit.name},
+        "remark": fitness_set.remark,
+    }
+
+
 def serialize_fitness_day_detail(day: FitnessDay) -> dict:
     groups: dict[int, dict] = {}
 
@@ -76,42 +148,71 @@ def serialize_fitness_day_detail(day: FitnessDay) -> dict:
                 "sets": [],
             }
 
-        unit = fitness_set.unit
-        set_type_value = (
-            fitness_set.set_type.value
-            if hasattr(fitness_set.set_type, "value")
-            else fitness_set.set_type
-        )
-        groups[exercise.id]["sets"].append(
-            {
-                "id": fitness_set.id,
-                "set_type": set_type_value,
-                "weight": fitness_set.weight,
-                "reps": fitness_set.reps,
-                "unit": {"id": unit.id, "name": unit.name},
-                "remark": fitness_set.remark,
-            }
-        )
+        groups[exercise.id]["sets"].append(serialize_fitness_set(fitness_set))
 
     return {
         "id": day.id,
         "date": day.date.isoformat() if day.date else None,
         "timezone": day.timezone,
-        "primary_muscles": parse_primary_muscles(day.primary_muscles),
+        "primary_muscles": serialize_primary_muscles(day),
         "start_time": day.start_time.isoformat() if day.start_time else None,
         "end_time": day.end_time.isoformat() if day.end_time else None,
         "exercises": list(groups.values()),
     }
 
 
-def list_fitness_days_by_month(db: Session, year: int, month: int) -> list[FitnessDay]:
+def list_fitness_days_by_month(
+    db: Session, year: int, month: int, muscle: MuscleGroup | None = None
+) -> list[FitnessDay]:
     stmt = select(FitnessDay).where(
         extract("year", FitnessDay.date) == year,
         extract("month", FitnessDay.date) == month,
     )
+    if muscle is not None:
+        stmt = stmt.join(FitnessDayMuscle).where(FitnessDayMuscle.muscle == muscle)
+    return list(db.execute(stmt).scalars().all())
+
+
+def list_fitness_days_by_muscle(
+    db: Session,
+    muscle: MuscleGroup,
+    from_date: datetime | None = None,
+    to_date: datetime | None = None,
+) -> list[FitnessDay]:
+    stmt = (
+        select(FitnessDay)
+        .join(FitnessDayMuscle)
+        .where(FitnessDayMuscle.muscle == muscle)
+    )
+    if from_date:
+        stmt = stmt.where(FitnessDay.date >= from_date.date())
+    if to_date:
+        stmt = stmt.where(FitnessDay.date <= to_date.date())
+    stmt = stmt.order_by(FitnessDay.date.desc())
     return list(db.execute(stmt).scalars().all())
 
 
+def count_fitness_days_by_muscle(
+    db: Session,
+    from_date: datetime | None = None,
+    to_date: datetime | None = None,
+) -> dict[str, int]:
+    stmt = (
+        select(FitnessDayMuscle.muscle, func.count(FitnessDayMuscle.fitness_day_id))
+        .join(FitnessDay)
+        .group_by(FitnessDayMuscle.muscle)
+    )
+    if from_date:
+        stmt = stmt.where(FitnessDay.date >= from_date.date())
+    if to_date:
+        stmt = stmt.where(FitnessDay.date <= to_date.date())
+
+    counts = {muscle_group.value: 0 for muscle_group in MuscleGroup}
+    for muscle, day_count in db.execute(stmt).all():
+        counts[muscle.value] = day_count
+    return counts
+
+
 def get_fitness_day_by_date(db: Session, date_obj: date) -> FitnessDay | None:
     stmt = select(FitnessDay).where(FitnessDay.date == date_obj)
     return db.execute(stmt).scalars().first()
@@ -130,12 +231,18 @@ def get_or_create_fitness_day(
 
     if existing_day:
         if primary_muscles is not None:
-            existing_day.primary_muscles = normalize_primary_muscle_selection(
-                primary_muscles
-            )
+            set_fitness_day_muscles(db, existing_day, primary_muscles)
             existing_day.updated_by = 1
             db.commit()
             db.refresh(existing_day)
+            day_channels.publish(
+                existing_day.id,
+                {
+                    "type": "day_updated",
+                    "fitness_day_id": existing_day.id,
+                    "primary_muscles": serialize_primary_muscles(existing_day),
+                },
+            )
         return existing_day
 
     # For past dates, start_time and end_time should probably be set to something sensible.
@@ -146,18 +253,26 @@ def get_or_create_fitness_day(
         # Set to 12:00 PM UTC of that date as a placeholder
         start_time = datetime.combine(date_obj, datetime.min.time(), tzinfo=timezone.utc).replace(hour=12)
 
-    new_day = FitnessDay(
-        created_by=1,
-        updated_by=1,
-        date=date_obj,
-        timezone=tz,
-        primary_muscles=normalize_primary_muscle_selection(primary_muscles),
-        start_time=start_time,
+    # A concurrent request may create the same date first; the unique date
+    # constraint turns that race into a no-op and we pick up the winner's row.
+    insert_stmt = (
+        sqlite_insert(FitnessDay)
+        .values(
+            created_by=1,
+            updated_by=1,
+            date=date_obj,
+            timezone=tz,
+            start_time=start_time,
+        )
+        .on_conflict_do_nothing(index_elements=[FitnessDay.date])
     )
-    db.add(new_day)
+    db.execute(insert_stmt)
+    day = db.execute(stmt).scalars().one()
+    if primary_muscles is not None:
+        set_fitness_day_muscles(db, day, primary_muscles)
     db.commit()
-    db.refresh(new_day)
-    return new_day
+    db.refresh(day)
+    return day
 
 
 def get_or_create_today_fitness_day(
@@ -175,6 +290,7 @@ def finish_today_fitness_day(db: Session, tz: str) -> FitnessDay | None:
     day.updated_by = 1
     db.commit()
     db.refresh(day)
+    publish_day_finished(day)
     return day
 
 
@@ -194,6 +310,7 @@ def finish_fitness_day(db: Session, day_id: int) -> FitnessDay | None:
     day.updated_by = 1
     db.commit()
     db.refresh(day)
+    publish_day_finished(day)
     return day
 
 
@@ -226,33 +343,43 @@ def create_fitness_set(db: Session, data: FitnessSetCreate, tz: str) -> FitnessS
     db.add(new_set)
     db.commit()
     db.refresh(new_set)
+    invalidate_last_sessions(new_set.exercise_id)
+    publish_set_event("set_created", new_set)
     return new_set
 
 
 def update_fitness_set(
-    db: Session, set_id: int, data: FitnessSetUpdate
+    db: Session, set_id: int, data: FitnessSetUpdate, defer: bool = False
 ) -> FitnessSet | None:
+    """
+    Update a set. With defer, the edit is buffered and coalesced with other
+    edits to the same set; the returned set reflects the merged, unsaved state.
+    """
     stmt = select(FitnessSet).where(FitnessSet.id == set_id)
     fitness_set = db.execute(stmt).scalars().first()
     if not fitness_set:
         return None
 
-    if data.exercise_id is not None:
-        fitness_set.exercise_id = data.exercise_id
-    if data.weight is not None:
-        fitness_set.weight = data.weight
-    if data.reps is not None:
-        fitness_set.reps = data.reps
-    if data.unit_id is not None:
-        fitness_set.unit_id = data.unit_id
-    if data.set_type is not None:
-        fitness_set.set_type = data.set_type
-    if data.remark is not None:
-        fitness_set.remark = data.remark
-
-    fitness_set.updated_by = 1
-    db.commit()
-    db.refresh(fitness_set)
+    changes = data.model_dump(exclude_none=True)
+    previous_exercise_id = fitness_set.exercise_id
+    if defer:
+        changes = set_write_buffer.add(set_id, changes)
+        db.expunge(fitness_set)
+        for field, value in changes.items():
+            setattr(fitness_set, field, value)
+    else:
+        with set_write_buffer.exclusive():
+            changes = {**set_write_buffer.pop(set_id), **changes}
+            for field, value in changes.items():
+                setattr(fitness_set, field, value)
+            fitness_set.updated_by = 1
+            db.commit()
+        db.refresh(fitness_set)
+    # Only once the edit is committed or buffered, so a concurrent lookup
+    # cannot re-cache the old rows
+    invalidate_last_sessions(previous_exercise_id, fitness_set.exercise_id)
+
+    publish_set_event("set_updated", fitness_set)
     return fitness_set
 
 
@@ -262,22 +389,132 @@ def delete_fitness_set(db: Session, set_id: int) -> bool:
     if not fitness_set:
         return False
 
+    exercise_id = fitness_set.exercise_id
     day_id = fitness_set.fitness_day_id
     count_stmt = select(func.count(FitnessSet.id)).where(FitnessSet.fitness_day_id == day_id)
     set_count = db.execute(count_stmt).scalar()
 
-    if set_count == 1:
-        day_stmt = select(FitnessDay).where(FitnessDay.id == day_id)
-        day = db.execute(day_stmt).scalars().first()
-        if day:
-            db.delete(day)
+    with set_write_buffer.exclusive():
+        set_write_buffer.pop(set_id)
+        if set_count == 1:
+            day_stmt = select(FitnessDay).where(FitnessDay.id == day_id)
+            day = db.execute(day_stmt).scalars().first()
+            if day:
+                db.delete(day)
+        else:
+            day = None
+            db.delete(fitness_set)
+        db.commit()
+    invalidate_last_sessions(exercise_id)
+    if day:
+        day_channels.publish(day_id, {"type": "day_deleted", "fitness_day_id": day_id})
     else:
-        db.delete(fitness_set)
-
-    db.commit()
+        day_channels.publish(
+            day_id, {"type": "set_deleted", "fitness_day_id": day_id, "set_id": set_id}
+        )
     return True
 
 
+def publish_set_event(event_type: str, fitness_set: FitnessSet) -> None:
+    set_data = FitnessSetRead.model_validate(fitness_set).model_dump(mode="json")
+    day_channels.publish(
+        fitness_set.fitness_day_id,
+        {"type": event_type, "fitness_day_id": fitness_set.fitness_day_id, "set": set_data},
+    )
+
+
+def publish_day_finished(day: FitnessDay) -> None:
+    day_channels.publish(
+        day.id,
+        {
+            "type": "day_finished",
+            "fitness_day_id": day.id,
+            "end_time": day.end_time.isoformat() if day.end_time else None,
+        },
+    )
+
+
+def invalidate_last_sessions(*exercise_ids: int | None) -> None:
+    affected = {exercise_id for exercise_id in exercise_ids if exercise_id is not None}
+    with _last_session_lock:
+        for exercise_id in affected:
+            _last_session_generations[exercise_id] = (
+                _last_session_generations.get(exercise_id, 0) + 1
+            )
+        last_session_cache.invalidate(lambda key: key[0] in affected)
+
+
+def get_last_exercise_sessions(
+    db: Session, exercise_ids: list[int], before: date
+) -> dict[int, dict]:
+    """
+    Sets of the most recent session before the given date for each exercise,
+    for pre-filling weight and reps.
+    """
+    sessions: dict[int, dict] = {}
+    missing = []
+    for exercise_id in dict.fromkeys(exercise_ids):
+        cached = last_session_cache.get((exercise_id, before))
+        if cached is None:
+            missing.append(exercise_id)
+        else:
+            sessions[exercise_id] = cached
+    if not missing:
+        return sessions
+
+    # Taken before reading so any write that lands during the query shows up as a new generation
+    with _last_session_lock:
+        generations = {
+            exercise_id: _last_session_generations.get(exercise_id, 0) for exercise_id in missing
+        }
+    flush_pending_set_updates(db)
+    latest = (
+        select(
+            FitnessSet.exercise_id,
+            func.max(FitnessDay.date).label("date"),
+        )
+        .join(FitnessDay)
+        .where(FitnessSet.exercise_id.in_(missing), FitnessDay.date < before)
+        .group_by(FitnessSet.exercise_id)
+        .subquery()
+    )
+    stmt = (
+        select(FitnessSet)
+        .join(FitnessDay)
+        .join(
+            latest,
+            and_(
+                latest.c.exercise_id == FitnessSet.exercise_id,
+                latest.c.date == FitnessDay.date,
+            ),
+        )
+        .options(contains_eager(FitnessSet.fitness_day), selectinload(FitnessSet.unit))
+        .order_by(FitnessSet.id)
+    )
+
+    found = {
+        exercise_id: {
+            "exercise_id": exercise_id,
+            "fitness_day_id": None,
+            "date": None,
+            "sets": [],
+        }
+        for exercise_id in missing
+    }
+    for fitness_set in db.execute(stmt).scalars().all():
+        session = found[fitness_set.exercise_id]
+        session["fitness_day_id"] = fitness_set.fitness_day_id
+        session["date"] = fitness_set.fitness_day.date.isoformat()
+        session["sets"].append(serialize_fitness_set(fitness_set))
+
+    with _last_session_lock:
+        for exercise_id, session in found.items():
+            if _last_session_generations.get(exercise_id, 0) == generations[exercise_id]:
+                last_session_cache.set((exercise_id, before), session)
+    sessions.update(found)
+    return sessions
+
+
 def list_units(db: Session) -> list[Unit]:
     stmt = select(Unit).order_by(Unit.name)
     return list(db.execute(stmt).scalars().all())
@@ -289,6 +526,8 @@ def list_fitness_logs(
     to_date: datetime | None = None,
     exercise_name: str | None = None,
 ) -> list[dict]:
+    # db may be a read-only session, so deferred edits go through their own session
+    flush_pending_set_updates()
     stmt = (
         select(FitnessSet)
         .join(FitnessDay)
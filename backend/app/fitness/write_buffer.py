@@ -0,0 +1,106 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.fitness.models import FitnessSet
+
+logger = logging.getLogger(__name__)
+
+FLUSH_DELAY_SECONDS = 2.0
+
+
+class SetWriteBuffer:
+    """
+    Write-behind buffer for fitness set edits.
+
+    Edits to the same set are merged in memory and written as a single batched
+    UPDATE once the flush window elapses, on explicit flush or at shutdown.
+    Direct writes to sets must go through exclusive() so an in-flight flush
+    cannot land an older buffered value on top of them.
+    """
+
+    def __init__(self, delay: float = FLUSH_DELAY_SECONDS):
+        self.delay = delay
+        self._pending: dict[int, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # Held from taking the pending edits until they are committed
+        self._flush_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Block flushes while a direct set write pops its pending edit and commits."""
+        with self._flush_lock:
+            yield
+
+    def add(self, set_id: int, changes: dict[str, Any]) -> dict[str, Any]:
+        """Merge changes into the pending edit for a set and return the merged edit."""
+        with self._lock:
+            merged = self._pending.setdefault(set_id, {})
+            merged.update(changes)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return dict(merged)
+
+    def pop(self, set_id: int) -> dict[str, Any]:
+        """Remove and return the pending edit for a set, if any."""
+        with self._lock:
+            return self._pending.pop(set_id, {})
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def flush(self, db: Session | None = None) -> int:
+        """Write all pending edits in one transaction. Returns the number of sets written."""
+        with self._flush_lock:
+            return self._flush(db)
+
+    def _flush(self, db: Session | None) -> int:
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+
+        rows = [
+            {"id": set_id, **changes, "updated_by": 1}
+            for set_id, changes in pending.items()
+        ]
+        session = db or SessionLocal()
+        try:
+            try:
+                session.execute(update(FitnessSet), rows)
+                session.commit()
+                return len(rows)
+            except SQLAlchemyError:
+                session.rollback()
+                logger.exception("Batched set update failed, retrying sets one by one")
+
+            written = 0
+            for row in rows:
+                try:
+                    session.execute(update(FitnessSet), [row])
+                    session.commit()
+                    written += 1
+                except SQLAlchemyError:
+                    session.rollback()
+                    logger.exception("Dropping buffered update for set %s", row["id"])
+            return written
+        finally:
+            if db is None:
+                session.close()
+
+
+set_write_buffer = SetWriteBuffer()
@@ -1,12 +1,82 @@
 import os
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
-from app.fitness.router import router as fitness_router
+# Routers, services and SQLAlchemy models are imported on the first request
+# (or at startup when pre-warming) to keep worker cold start short.
+PREWARM = os.environ.get("FITNESS_LOG_PREWARM", "").lower() in ("1", "true", "yes")
 
-app = FastAPI(title="Fitness Log")
+_routes_loaded = False
+_routes_lock = threading.Lock()
+
+
+def upgrade_database() -> None:
+    """Bring the database schema up to date with the models."""
+    from app.core import database
+    from app.fitness.migrations import upgrade_schema
+
+    upgrade_schema(database.engine)
+
+
+def load_routes() -> None:
+    """Import the API routers and register them, once."""
+    global _routes_loaded
+    if _routes_loaded:
+        return
+    with _routes_lock:
+        if _routes_loaded:
+            return
+        from app.fitness.router import router as fitness_router
+
+        app.include_router(fitness_router)
+        # The SPA catch-all must stay behind every API route
+        app.add_api_route("/{full_path:path}", serve_spa, methods=["GET"])
+        _routes_loaded = True
+
+
+def prewarm() -> None:
+    """Load routes, configure mappers and open a pooled connection ahead of traffic."""
+    load_routes()
+    from sqlalchemy.orm import configure_mappers
+    from app.core.database import engine
+
+    configure_mappers()
+    with engine.connect():
+        pass
+
+
+class LazyRoutesMiddleware:
+    """Registers the API routes before the first request is routed."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            load_routes()
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Routes rely on the upgraded schema; startup completes before any request is served
+    await run_in_threadpool(upgrade_database)
+    if PREWARM:
+        prewarm()
+    yield
+    if _routes_loaded:
+        # Persist deferred set edits before the worker exits
+        from app.fitness.write_buffer import set_write_buffer
+
+        set_write_buffer.flush()
+
+
+app = FastAPI(title="Fitness Log", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -16,15 +86,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-app.include_router(fitness_router)
+app.add_middleware(LazyRoutesMiddleware)
 
 # Serve Static Files (Vue Build)
 # Define the static directory path
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 
-# Catch-all route for Single Page Application (SPA)
-@app.get("/{full_path:path}")
+# Catch-all route for Single Page Application (SPA), registered by load_routes
 async def serve_spa(full_path: str):
     # Exclude API routes from catch-all if they weren't matched
     if full_path.startswith("api/"):